@@ -4,443 +4,920 @@
 """
 TS Downloader - Baixador de vídeos em segmentos .ts
 Este script baixa sequências de arquivos .ts e os combina em um único arquivo MP4
+
+Também pode ser usado como biblioteca:
+
+    downloader = Downloader(output_dir=Path("./videos"), on_event=print)
+    async for segment in downloader.stream(url):
+        ...
 """
 
 import os
-import re
 import sys
 import time
 import shutil
+import pstats
+import asyncio
+import cProfile
 import argparse
 import requests
+import tempfile
+import threading
+import traceback
 import subprocess
+import tracemalloc
+from io import StringIO
 from pathlib import Path
+from contextlib import contextmanager
 from urllib.parse import urlparse
 
-# Configurações
+try:
+    from contextlib import aclosing
+except ImportError:  # Python < 3.10
+    class aclosing:
+        """Fecha o gerador assíncrono ao sair do bloco `async with`"""
+        
+        def __init__(self, thing):
+            self.thing = thing
+        
+        async def __aenter__(self):
+            return self.thing
+        
+        async def __aexit__(self, *exc_info):
+            await self.thing.aclose()
+
+# Configurações padrão (cada Downloader pode sobrescrever as suas)
 TEMP_DIR = Path("./temp_segments")
 OUTPUT_DIR = Path("./videos")
 MAX_RETRIES = 3
 TIMEOUT = 30
 SLEEP_BETWEEN_REQUESTS = 0.2
+MAX_CONSECUTIVE_FAILURES = 5
+PROFILE_REPORT_NAME = "profile_report.txt"
 
-def ensure_dirs():
-    """Garante que os diretórios necessários existem"""
-    TEMP_DIR.mkdir(exist_ok=True)
-    OUTPUT_DIR.mkdir(exist_ok=True)
-    return TEMP_DIR, OUTPUT_DIR
+# Padrões de nomeação testados para descobrir os segmentos seguintes
+SEGMENT_PATTERNS = [
+    # Padrão 001, 002, 003
+    lambda url, i: url.replace('.ts', f'_{i:03d}.ts'),
+    # Padrão 1, 2, 3
+    lambda url, i: url.replace('.ts', f'_{i}.ts'),
+    # Padrão quality_720_1.ts
+    lambda url, i: url.replace('quality_720.ts', f'quality_720_{i}.ts'),
+    # Padrão segment1.ts, segment2.ts
+    lambda url, i: url.replace('.ts', f'{i}.ts'),
+    # Padrão chunk-1-xxxx.ts
+    lambda url, i: url.replace('.ts', f'-{i}.ts'),
+]
 
-def download_segment(url, output_path, session=None, retries=0):
-    """
-    Baixa um segmento individual de vídeo
+class PhaseTimer:
+    """Acumula o tempo gasto em cada fase de um download"""
+    
+    def __init__(self):
+        self.totals = {}
+        self.counts = {}
+        self.counters = {}
+        self.started_at = time.perf_counter()
+    
+    def add(self, name, elapsed):
+        """Registra uma medição de `elapsed` segundos para a fase `name`"""
+        self.totals[name] = self.totals.get(name, 0.0) + elapsed
+        self.counts[name] = self.counts.get(name, 0) + 1
+    
+    def increment(self, name):
+        """Incrementa o contador de ocorrências `name` (ex: retries), sem tempo associado"""
+        self.counters[name] = self.counters.get(name, 0) + 1
+    
+    @contextmanager
+    def phase(self, name):
+        """Cronometra o bloco como uma ocorrência da fase `name`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
     
-    Args:
-        url: URL do segmento
-        output_path: Caminho para salvar o segmento
-        session: Sessão de requests (opcional)
-        retries: Número de tentativas já realizadas
+    def summary(self):
+        """
+        Monta o resumo fase a fase das medições
         
-    Returns:
-        bool: True se o download foi bem-sucedido, False caso contrário
-    """
-    if retries > MAX_RETRIES:
-        print(f"Erro: Número máximo de tentativas excedido para {url}")
-        return False
-    
-    try:
-        if session is None:
-            session = requests
-        
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-            "Accept": "*/*",
-            "Accept-Encoding": "gzip, deflate, br",
-            "Connection": "keep-alive",
-            "Referer": f"https://{urlparse(url).netloc}/"
-        }
-        
-        response = session.get(url, headers=headers, timeout=TIMEOUT)
-        
-        if response.status_code == 200:
-            with open(output_path, 'wb') as f:
-                f.write(response.content)
-            return True
-        elif response.status_code == 403 or response.status_code == 404:
-            # Se for 403 (Forbidden) ou 404 (Not Found), provavelmente chegamos ao fim dos segmentos
-            print(f"Segmento não disponível (status {response.status_code}): {url}")
-            return False
-        else:
-            print(f"Erro ao baixar segmento {url} - Status: {response.status_code}")
-            time.sleep(1 + retries)  # Espera um pouco mais a cada retry
-            return download_segment(url, output_path, session, retries + 1)
-            
-    except (requests.exceptions.RequestException, requests.exceptions.Timeout) as e:
-        print(f"Erro de conexão: {str(e)}")
-        time.sleep(1 + retries)  # Espera um pouco mais a cada retry
-        return download_segment(url, output_path, session, retries + 1)
-    except Exception as e:
-        print(f"Erro desconhecido: {str(e)}")
-        return False
+        Returns:
+            str: Tabela com tempo total, chamadas e percentual de cada fase
+        """
+        wall = time.perf_counter() - self.started_at
+        lines = [
+            f"{'Fase':<28} {'Chamadas':>9} {'Total (s)':>11} {'Média (s)':>11} {'% total':>8}",
+            "-" * 71,
+        ]
+        for name, total in sorted(self.totals.items(), key=lambda item: item[1], reverse=True):
+            count = self.counts[name]
+            percent = (total / wall * 100) if wall > 0 else 0.0
+            lines.append(f"{name:<28} {count:>9} {total:>11.3f} {total / count:>11.4f} {percent:>7.1f}%")
+        lines.append("-" * 71)
+        lines.append(f"{'Tempo total do job':<28} {'':>9} {wall:>11.3f}")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"{name:<28} {value:>9}")
+        lines.append("Obs.: discovery e download são medidas por segmento; fetch, write, validate")
+        lines.append("e sleep_retry estão contidas nelas.")
+        return "\n".join(lines)
 
-def download_all_segments(base_url, output_name, start_segment=0, max_segments=1000):
+class DownloadEvent:
     """
-    Baixa todos os segmentos de vídeo em sequência
+    Evento estruturado emitido pelo Downloader
     
-    Args:
-        base_url: URL base dos segmentos (sem o número)
-        output_name: Nome do arquivo de saída
-        start_segment: Número do segmento inicial
-        max_segments: Número máximo de segmentos a tentar
-        
-    Returns:
-        list: Lista de caminhos dos segmentos baixados
+    Attributes:
+        kind: Tipo do evento (ex: "segment_completed", "combine_method_failed")
+        message: Mensagem legível, a mesma exibida pela linha de comando
+        data: Campos específicos do evento (url, index, path, method...)
+        timestamp: Momento em que o evento foi emitido (time.time())
     """
-    # Extrair o diretório base e o padrão de nome do arquivo
-    url_parts = urlparse(base_url)
-    url_path = url_parts.path
-    
-    # Verificar se é uma URL da Ebradi
-    is_ebradi = "ebradi" in url_path.lower()
-    
-    # Determinar o formato do nome do segmento
-    if "quality_" in url_path:
-        # Formato: quality_720.ts, quality_720_001.ts, etc.
-        base_name = re.sub(r'_\d+\.ts$', '', url_path.split('/')[-1])
-        ext = ".ts"
-        segment_format = "sequential"  # Formato sequencial (000, 001, 002...)
-    else:
-        # Outro formato, assumir padrão genérico
-        base_name = url_path.split('/')[-1].split('.')[0]
-        ext = ".ts"
-        segment_format = "sequential"
     
-    # Criar sessão para reutilizar conexões
-    session = requests.Session()
+    def __init__(self, kind, message, **data):
+        self.kind = kind
+        self.message = message
+        self.data = data
+        self.timestamp = time.time()
     
-    temp_dir, output_dir = ensure_dirs()
-    segment_paths = []
-    
-    print(f"\nIniciando download dos segmentos de {base_url}")
-    print(f"Formato detectado: {segment_format}")
+    def __repr__(self):
+        return f"DownloadEvent({self.kind!r}, {self.message!r}, {self.data!r})"
+
+class Segment:
+    """Segmento baixado e validado, pronto para ser combinado"""
     
-    if is_ebradi:
-        print(f"Detectado vídeo da Ebradi. Verificando formatos específicos.")
+    def __init__(self, index, url, path):
+        self.index = index
+        self.url = url
+        self.path = path
+        self.size = path.stat().st_size
     
-    # Baixar segmentos em sequência
-    segment_count = 0
-    consecutive_failures = 0
-    i = start_segment
+    def __repr__(self):
+        return f"Segment(index={self.index}, path={str(self.path)!r}, size={self.size})"
+
+def build_output_name(url, output=None):
+    """
+    Monta o nome do arquivo MP4 de saída
     
-    # Primeiro, tenta baixar o segmento inicial
-    print(f"Baixando segmento {i}: {base_url}")
-    segment_filename = f"segment_{i:03d}{ext}"
-    segment_path = temp_dir / segment_filename
+    Args:
+        url: URL do segmento base
+        output: Nome escolhido pelo usuário (opcional)
     
-    if download_segment(base_url, segment_path, session):
-        segment_paths.append(segment_path)
-        segment_count += 1
-        
-        # Para vídeos da Ebradi, se tivermos apenas um segmento grande, pode ser o vídeo completo
-        if is_ebradi:
-            filesize = segment_path.stat().st_size / (1024 * 1024)  # MB
-            print(f"Tamanho do segmento: {filesize:.2f} MB")
-            
-            if filesize > 50:  # Se for maior que 50MB, pode ser o vídeo completo
-                print("\nDetectado vídeo completo em um único segmento (tamanho grande).")
-                print("Pulando busca por segmentos adicionais.")
-                return segment_paths
+    Returns:
+        str: Nome do arquivo terminando em .mp4
+    """
+    if output:
+        output_name = output
     else:
-        print(f"Erro: Não foi possível baixar o segmento inicial: {base_url}")
-        print("Verifique se a URL está correta e tente novamente.")
-        return []
-    
-    # Depois, tenta baixar os segmentos sequenciais
-    i = 1  # Começar do segmento 1
-    
-    # Lista de diferentes padrões de nomeação para tentar
-    patterns = [
-        # Padrão 001, 002, 003
-        lambda url, i: url.replace('.ts', f'_{i:03d}.ts'),
-        # Padrão 1, 2, 3
-        lambda url, i: url.replace('.ts', f'_{i}.ts'),
-        # Padrão quality_720_1.ts
-        lambda url, i: url.replace('quality_720.ts', f'quality_720_{i}.ts'),
-        # Padrão segment1.ts, segment2.ts
-        lambda url, i: url.replace('.ts', f'{i}.ts'),
-        # Padrão chunk-1-xxxx.ts
-        lambda url, i: url.replace('.ts', f'-{i}.ts'),
-    ]
-    
-    # Testar cada padrão com o primeiro segmento
-    current_pattern = None
-    for pattern_func in patterns:
-        next_url = pattern_func(base_url, i)
-        segment_filename = f"segment_{i:03d}{ext}"
-        segment_path = temp_dir / segment_filename
-        
-        print(f"Testando padrão: {next_url}")
-        
-        if download_segment(next_url, segment_path, session):
-            segment_paths.append(segment_path)
-            segment_count += 1
-            current_pattern = pattern_func
-            print(f"Padrão encontrado! Usando: {next_url}")
-            break
+        # Extrai nome do vídeo da URL
+        url_parts = urlparse(url)
+        path_parts = url_parts.path.split('/')
+        
+        # Tenta obter um nome significativo
+        if len(path_parts) >= 2:
+            # Pega o penúltimo segmento da URL, que geralmente tem o nome do vídeo
+            video_name = path_parts[-2]
         else:
-            # Remover arquivo vazio ou parcial
-            if segment_path.exists():
-                segment_path.unlink()
-    
-    # Se encontrou um padrão, continuar baixando os segmentos
-    if current_pattern:
-        i = 2  # Começar do próximo segmento
-        while i < max_segments and consecutive_failures < 5:
-            segment_url = current_pattern(base_url, i)
-            segment_filename = f"segment_{i:03d}{ext}"
-            segment_path = temp_dir / segment_filename
-            
-            print(f"Baixando segmento {i}: {segment_url}")
-            
-            if download_segment(segment_url, segment_path, session):
-                segment_paths.append(segment_path)
-                segment_count += 1
-                consecutive_failures = 0
-            else:
-                consecutive_failures += 1
-                print(f"Falha {consecutive_failures} de 5. Tentando mais alguns segmentos...")
-            
-            # Pausa para não sobrecarregar o servidor
-            time.sleep(SLEEP_BETWEEN_REQUESTS)
-            i += 1
-    else:
-        print("Não foi possível encontrar o padrão de nomenclatura dos segmentos.")
-        print("Usando apenas o segmento inicial.")
-    
-    print(f"\nDownload de segmentos concluído: {segment_count} segmentos baixados")
+            video_name = "video"
+        
+        output_name = f"{video_name}.mp4"
     
-    return segment_paths
+    if not output_name.lower().endswith('.mp4'):
+        output_name += '.mp4'
+    return output_name
 
-def combine_segments(segment_paths, output_path):
+class Downloader:
     """
-    Combina segmentos TS em um único arquivo MP4
+    Baixador reentrante de vídeos em segmentos .ts
     
-    Args:
-        segment_paths: Lista de caminhos dos segmentos
-        output_path: Caminho do arquivo MP4 de saída
-        
-    Returns:
-        bool: True se a combinação foi bem-sucedida
+    Toda a configuração e o estado ficam na instância, então vários downloads
+    podem rodar no mesmo processo (inclusive no mesmo event loop). Em vez de
+    imprimir, o Downloader emite DownloadEvent para o callback `on_event`.
     """
-    if not segment_paths:
-        print("Erro: Nenhum segmento para combinar")
-        return False
-    
-    print(f"\nCombinando {len(segment_paths)} segmentos em {output_path}")
     
-    # Se for apenas um segmento, tentar remuxar diretamente
-    if len(segment_paths) == 1:
-        print("Detectado segmento único. Tentando remuxar diretamente...")
+    def __init__(self, temp_dir=TEMP_DIR, output_dir=OUTPUT_DIR, ffmpeg_path=None,
+                 max_retries=MAX_RETRIES, timeout=TIMEOUT,
+                 sleep_between_requests=SLEEP_BETWEEN_REQUESTS,
+                 max_consecutive_failures=MAX_CONSECUTIVE_FAILURES,
+                 on_event=None, use_threads=True):
+        """
+        Args:
+            temp_dir: Diretório onde cada job cria sua pasta de segmentos
+            output_dir: Diretório dos vídeos finais
+            ffmpeg_path: Executável do ffmpeg (padrão: "ffmpeg" do PATH)
+            max_retries: Tentativas extras por segmento em erros transitórios
+            timeout: Timeout de cada requisição em segundos
+            sleep_between_requests: Pausa entre segmentos em segundos
+            max_consecutive_failures: Falhas seguidas que encerram a busca
+            on_event: Callback chamado com cada DownloadEvent (opcional). É
+                sempre chamado na thread do event loop; exceções levantadas
+                por ele são exibidas em stderr e não interrompem o download
+            use_threads: Rodar rede/ffmpeg em threads do executor; False roda
+                tudo na thread do event loop (útil para o cProfile, que só
+                enxerga a thread em que foi ativado)
+        """
+        self.temp_dir = Path(temp_dir)
+        self.output_dir = Path(output_dir)
+        self.ffmpeg_path = ffmpeg_path
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.sleep_between_requests = sleep_between_requests
+        self.max_consecutive_failures = max_consecutive_failures
+        self.on_event = on_event
+        self.use_threads = use_threads
+        # Guarda o event loop enquanto uma chamada bloqueante roda em thread do executor
+        self._worker = threading.local()
+    
+    def emit(self, kind, message, **data):
+        """
+        Envia um DownloadEvent para o callback configurado
         
-        # Método 1: Remuxar usando ffmpeg (preferencial)
+        Eventos gerados em threads do executor são entregues na thread do
+        event loop, então o callback pode mexer em filas e futures do asyncio.
+        """
+        if self.on_event is None:
+            return
+        event = DownloadEvent(kind, message, **data)
+        loop = getattr(self._worker, "loop", None)
+        if loop is not None:
+            loop.call_soon_threadsafe(self._deliver, event)
+        else:
+            self._deliver(event)
+    
+    def _deliver(self, event):
+        """Chama o callback de eventos; um erro nele nunca derruba o download"""
         try:
-            # Comando ffmpeg para remuxar TS para MP4
-            cmd = get_ffmpeg_command() + [
-                "-i", str(segment_paths[0]),
-                "-c", "copy",  # Copiar streams sem recodificar
-                "-bsf:a", "aac_adtstoasc",  # Necessário para alguns streams AAC
-                "-movflags", "+faststart",  # Otimiza para streaming web
-                str(output_path)
-            ]
+            self.on_event(event)
+        except Exception:
+            print(f"Erro no callback de eventos ({event.kind}):", file=sys.stderr)
+            traceback.print_exc()
+    
+    def ensure_dirs(self, timer=None):
+        """Garante que os diretórios necessários existem"""
+        timer = timer if timer is not None else PhaseTimer()
+        with timer.phase("ensure_dirs"):
+            self.temp_dir.mkdir(parents=True, exist_ok=True)
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+        return self.temp_dir, self.output_dir
+    
+    def create_job_dir(self, timer=None):
+        """Cria uma pasta exclusiva para os segmentos de um job"""
+        self.ensure_dirs(timer)
+        return Path(tempfile.mkdtemp(prefix="job_", dir=str(self.temp_dir)))
+    
+    def locate_ffmpeg(self, preferred=None, timer=None):
+        """
+        Procura um ffmpeg utilizável e o guarda em `self.ffmpeg_path`
+        
+        Args:
+            preferred: Caminho informado pelo usuário, testado primeiro
+            timer: PhaseTimer do job (opcional)
+        
+        Returns:
+            str: Caminho do ffmpeg encontrado, ou None
+        """
+        timer = timer if timer is not None else PhaseTimer()
+        with timer.phase("locate_ffmpeg"):
+            self.ffmpeg_path = None
             
-            print("Executando ffmpeg para remuxar o segmento...")
-            process = subprocess.run(cmd, capture_output=True, text=True)
+            # Primeiro, tentar o caminho fornecido pelo usuário
+            if preferred:
+                try:
+                    subprocess.run([preferred, "-version"], capture_output=True, text=True)
+                    self.ffmpeg_path = preferred
+                    self.emit("ffmpeg_found", f"Usando ffmpeg em: {preferred}", path=preferred)
+                except Exception:
+                    self.emit("warning", f"AVISO: ffmpeg não encontrado em {preferred}", path=preferred)
             
-            if process.returncode == 0:
-                print("Remuxagem com ffmpeg concluída com sucesso!")
-                return True
-            else:
-                print(f"Erro ao remuxar com ffmpeg: {process.stderr}")
-                # Continua para métodos alternativos
-        except Exception as e:
-            print(f"Erro durante remuxagem com ffmpeg: {str(e)}")
-            # Continua para métodos alternativos
+            # Tentar executável no diretório atual
+            if not self.ffmpeg_path:
+                try:
+                    local_ffmpeg = Path("./ffmpeg").absolute()
+                    if local_ffmpeg.exists():
+                        subprocess.run([str(local_ffmpeg), "-version"], capture_output=True, text=True)
+                        self.ffmpeg_path = str(local_ffmpeg)
+                        self.emit("ffmpeg_found", f"Usando ffmpeg local em: {self.ffmpeg_path}", path=self.ffmpeg_path)
+                except Exception:
+                    pass
+            
+            # Por fim, tentar no PATH do sistema
+            if not self.ffmpeg_path:
+                try:
+                    subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True)
+                    self.ffmpeg_path = "ffmpeg"
+                    self.emit("ffmpeg_found", "Usando ffmpeg do sistema.", path="ffmpeg")
+                except Exception:
+                    self.emit("warning", "AVISO: ffmpeg não encontrado. A combinação de segmentos pode ser menos eficiente.")
+            
+        return self.ffmpeg_path
+    
+    def ffmpeg_command(self):
+        """Retorna o comando ffmpeg, usando o caminho configurado se disponível"""
+        return [self.ffmpeg_path] if self.ffmpeg_path else ["ffmpeg"]
+    
+    async def _run_blocking(self, func, *args):
+        """Executa uma chamada bloqueante sem travar o event loop (se use_threads)"""
+        if not self.use_threads:
+            return func(*args)
+        loop = asyncio.get_running_loop()
         
-        # Método 2: Usar rename/copy direto se for MP4 mascarado como TS
+        def run_in_worker():
+            self._worker.loop = loop
+            try:
+                return func(*args)
+            finally:
+                self._worker.loop = None
+        
+        future = loop.run_in_executor(None, run_in_worker)
         try:
-            # Verificar conteúdo do arquivo para determinar tipo real
-            with open(segment_paths[0], 'rb') as f:
-                header = f.read(12)  # Ler primeiros bytes
-                
-            # Verificar se é um MP4 real (começa com ftyp ou moov)
-            is_mp4 = False
-            for pattern in [b'ftyp', b'moov']:
-                if pattern in header:
-                    is_mp4 = True
-                    break
-            
-            if is_mp4:
-                print("Detectado cabeçalho MP4 no segmento .ts. Copiando diretamente...")
-                shutil.copy2(segment_paths[0], output_path)
-                print("Cópia direta concluída.")
-                return True
-        except Exception as e:
-            print(f"Erro durante verificação de cabeçalho: {str(e)}")
-            # Continua para métodos alternativos
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # A thread não pode ser interrompida: esperar ela terminar antes de
+            # devolver o controle, senão ela escreve arquivos depois da limpeza
+            await asyncio.wait([future])
+            raise
+    
+    def validate_segment(self, segment_path, timer=None):
+        """
+        Verifica se o segmento baixado é utilizável
+        
+        Args:
+            segment_path: Caminho do segmento salvo
+            timer: PhaseTimer do job (opcional)
         
-        # Método 3: Usar mkvmerge se disponível (pode lidar com diversos formatos)
+        Returns:
+            bool: True se o arquivo existe e não está vazio
+        """
+        timer = timer if timer is not None else PhaseTimer()
+        with timer.phase("validate"):
+            return segment_path.exists() and segment_path.stat().st_size > 0
+    
+    def _fetch_segment(self, session, url, output_path, timer):
+        """
+        Faz uma única tentativa de baixar um segmento (bloqueante)
+        
+        Args:
+            session: Sessão de requests
+            url: URL do segmento
+            output_path: Caminho para salvar o segmento
+            timer: PhaseTimer do job
+        
+        Returns:
+            str: "ok", "missing" (fim dos segmentos), "retry" ou "error"
+        """
         try:
-            cmd = ["mkvmerge", "-o", str(output_path), str(segment_paths[0])]
-            print("Tentando remuxar com mkvmerge...")
-            process = subprocess.run(cmd, capture_output=True, text=True)
+            headers = {
+                "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+                "Accept": "*/*",
+                "Accept-Encoding": "gzip, deflate, br",
+                "Connection": "keep-alive",
+                "Referer": f"https://{urlparse(url).netloc}/"
+            }
             
-            if process.returncode == 0 or process.returncode == 1:  # mkvmerge retorna 1 para avisos
-                print("Remuxagem com mkvmerge concluída!")
-                return True
+            with timer.phase("fetch"):
+                response = session.get(url, headers=headers, timeout=self.timeout)
+                content = response.content if response.status_code == 200 else None
+            
+            if response.status_code == 200:
+                with timer.phase("write"):
+                    with open(output_path, 'wb') as f:
+                        f.write(content)
+                if not self.validate_segment(output_path, timer):
+                    self.emit("segment_missing", f"Segmento vazio recebido: {url}", url=url, status=200)
+                    return "missing"
+                return "ok"
+            elif response.status_code == 403 or response.status_code == 404:
+                # Se for 403 (Forbidden) ou 404 (Not Found), provavelmente chegamos ao fim dos segmentos
+                self.emit("segment_missing", f"Segmento não disponível (status {response.status_code}): {url}", url=url, status=response.status_code)
+                return "missing"
             else:
-                print(f"Erro ao remuxar com mkvmerge: {process.stderr}")
-                # Continua para método alternativo
+                self.emit("segment_error", f"Erro ao baixar segmento {url} - Status: {response.status_code}", url=url, status=response.status_code)
+                return "retry"
+        
+        except requests.exceptions.RequestException as e:
+            self.emit("segment_error", f"Erro de conexão: {str(e)}", url=url, error=str(e))
+            return "retry"
         except Exception as e:
-            print(f"Erro ou mkvmerge não disponível: {str(e)}")
-            # Continua para método alternativo
+            self.emit("segment_error", f"Erro desconhecido: {str(e)}", url=url, error=str(e))
+            return "error"
     
-    # Método para múltiplos segmentos ou se os anteriores falharam
-    # Método 4: Concatenação usando o ffmpeg
-    try:
-        # Criar arquivo de lista de segmentos para o ffmpeg
-        segments_list_path = TEMP_DIR / "segments.txt"
-        with open(segments_list_path, 'w') as f:
-            for segment_path in segment_paths:
-                f.write(f"file '{segment_path.absolute()}'\n")
-        
-        # Comando ffmpeg para concatenar
-        cmd = get_ffmpeg_command() + [
-            "-f", "concat",
-            "-safe", "0",
-            "-i", str(segments_list_path),
-            "-c", "copy",
-            "-bsf:a", "aac_adtstoasc",  # Necessário para alguns streams AAC
-            "-movflags", "+faststart",  # Otimiza para streaming web
-            str(output_path)
-        ]
+    async def download_segment(self, session, url, output_path, timer=None):
+        """
+        Baixa um segmento individual de vídeo, repetindo em erros transitórios
         
-        print("Executando ffmpeg para combinar os segmentos...")
-        process = subprocess.run(cmd, capture_output=True, text=True)
+        Com use_threads, a requisição roda em uma thread do executor para não bloquear o event loop.
         
-        if process.returncode == 0:
-            print("Combinação com ffmpeg concluída com sucesso!")
-            return True
-        else:
-            print(f"Erro ao combinar com ffmpeg: {process.stderr}")
-            # Continua para método alternativo
+        Args:
+            session: Sessão de requests
+            url: URL do segmento
+            output_path: Caminho para salvar o segmento
+            timer: PhaseTimer do job (opcional)
+        
+        Returns:
+            bool: True se o download foi bem-sucedido, False caso contrário
+        """
+        timer = timer if timer is not None else PhaseTimer()
+        for retries in range(self.max_retries + 1):
+            result = await self._run_blocking(self._fetch_segment, session, url, output_path, timer)
+            if result == "ok":
+                return True
+            if result != "retry":
+                return False
             
-    except Exception as e:
-        print(f"Erro durante combinação com ffmpeg: {str(e)}")
-        # Continua para método alternativo
+            if retries < self.max_retries:
+                timer.increment("retries")
+                self.emit("retry", f"Nova tentativa {retries + 1} de {self.max_retries} para {url}", url=url, attempt=retries + 1)
+                with timer.phase("sleep_retry"):
+                    await asyncio.sleep(1 + retries)  # Espera um pouco mais a cada retry
+        
+        self.emit("segment_error", f"Erro: Número máximo de tentativas excedido para {url}", url=url)
+        return False
     
-    # Método 5: Usar ffmpeg com protocolo TS
-    try:
-        print("Tentando método alternativo com ffmpeg (protocolo TS)...")
-        # Concatenar todos os arquivos .ts em um único .ts
-        ts_concat_path = TEMP_DIR / "concatenated.ts"
-        
-        with open(ts_concat_path, 'wb') as outfile:
-            for segment_path in segment_paths:
-                with open(segment_path, 'rb') as infile:
-                    outfile.write(infile.read())
-        
-        # Converter o .ts concatenado para MP4
-        cmd = get_ffmpeg_command() + [
-            "-i", str(ts_concat_path),
-            "-c", "copy",
-            "-bsf:a", "aac_adtstoasc",
-            "-movflags", "+faststart",
-            str(output_path)
-        ]
+    async def _download_indexed(self, session, url, index, job_dir, timer):
+        """Baixa o segmento `index` e o devolve como Segment, ou None se falhar"""
+        segment_path = job_dir / f"segment_{index:03d}.ts"
         
-        process = subprocess.run(cmd, capture_output=True, text=True)
+        if await self.download_segment(session, url, segment_path, timer):
+            segment = Segment(index, url, segment_path)
+            self.emit("segment_completed", f"Segmento {index} concluído ({segment.size} bytes)", segment=segment)
+            return segment
         
-        # Limpar arquivo temporário
-        if ts_concat_path.exists():
-            ts_concat_path.unlink()
+        # Remover arquivo vazio ou parcial
+        if segment_path.exists():
+            segment_path.unlink()
+        return None
+    
+    async def stream(self, url, start_segment=0, max_segments=1000, job_dir=None, timer=None):
+        """
+        Baixa os segmentos de vídeo em sequência, entregando cada um ao terminar
         
-        if process.returncode == 0:
-            print("Remuxagem do TS concatenado concluída com sucesso!")
-            return True
-        else:
-            print(f"Erro ao remuxar o TS concatenado: {process.stderr}")
-            # Continua para método alternativo
-    except Exception as e:
-        print(f"Erro durante remuxagem do TS concatenado: {str(e)}")
-        # Continua para método alternativo
+        Uso (aclosing garante que a sessão seja fechada mesmo com `break`):
+            async with aclosing(downloader.stream(url)) as segments:
+                async for segment in segments:
+                    print(segment.path)
+        
+        Os arquivos dos segmentos entregues pertencem a quem chamou; use
+        `cleanup` para apagá-los. Se o job for cancelado (ou nada for baixado),
+        a pasta criada pelo stream é removida com todo o conteúdo.
+        
+        Args:
+            url: URL do segmento base (ex: site.com/video/quality_720.ts)
+            start_segment: Número do segmento inicial
+            max_segments: Número máximo de segmentos a tentar
+            job_dir: Pasta dos segmentos (padrão: uma nova pasta em temp_dir)
+            timer: PhaseTimer do job (padrão: um novo, enviado no evento download_finished)
+        
+        Yields:
+            Segment: Segmentos baixados e validados, em ordem
+        """
+        # Verificar se é uma URL da Ebradi
+        is_ebradi = "ebradi" in urlparse(url).path.lower()
+        
+        timer = timer if timer is not None else PhaseTimer()
+        created_job_dir = job_dir is None
+        job_dir = self.create_job_dir(timer) if created_job_dir else Path(job_dir)
+        job_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Criar sessão para reutilizar conexões
+        session = requests.Session()
+        segment_count = 0
+        cancelled = False
+        
+        self.emit("download_started", f"Iniciando download dos segmentos de {url}", url=url, job_dir=job_dir)
+        self.emit("download_progress", "Formato detectado: sequential", segment_format="sequential")
+        
+        if is_ebradi:
+            self.emit("download_progress", "Detectado vídeo da Ebradi. Verificando formatos específicos.")
+        
+        try:
+            # Primeiro, tenta baixar o segmento inicial
+            self.emit("segment_started", f"Baixando segmento {start_segment}: {url}", index=start_segment, url=url)
+            with timer.phase("discovery"):
+                segment = await self._download_indexed(session, url, start_segment, job_dir, timer)
+            
+            if segment is None:
+                self.emit("download_failed", f"Erro: Não foi possível baixar o segmento inicial: {url}", url=url)
+                self.emit("download_failed", "Verifique se a URL está correta e tente novamente.", url=url)
+                return
+            
+            segment_count += 1
+            yield segment
+            
+            # Para vídeos da Ebradi, se tivermos apenas um segmento grande, pode ser o vídeo completo
+            if is_ebradi:
+                filesize = segment.size / (1024 * 1024)  # MB
+                self.emit("download_progress", f"Tamanho do segmento: {filesize:.2f} MB", size=segment.size)
+                
+                if filesize > 50:  # Se for maior que 50MB, pode ser o vídeo completo
+                    self.emit("full_video_detected", "Detectado vídeo completo em um único segmento (tamanho grande).")
+                    self.emit("download_progress", "Pulando busca por segmentos adicionais.")
+                    return
+            
+            # Depois, testar cada padrão com o segmento 1
+            current_pattern = None
+            for pattern_func in SEGMENT_PATTERNS:
+                next_url = pattern_func(url, 1)
+                self.emit("pattern_probe", f"Testando padrão: {next_url}", url=next_url)
+                
+                with timer.phase("discovery"):
+                    segment = await self._download_indexed(session, next_url, 1, job_dir, timer)
+                
+                if segment is not None:
+                    current_pattern = pattern_func
+                    self.emit("pattern_found", f"Padrão encontrado! Usando: {next_url}", url=next_url)
+                    segment_count += 1
+                    yield segment
+                    break
+            
+            if current_pattern is None:
+                self.emit("pattern_not_found", "Não foi possível encontrar o padrão de nomenclatura dos segmentos.")
+                self.emit("pattern_not_found", "Usando apenas o segmento inicial.")
+                return
+            
+            # Se encontrou um padrão, continuar baixando os segmentos
+            consecutive_failures = 0
+            i = 2  # Começar do próximo segmento
+            while i < max_segments and consecutive_failures < self.max_consecutive_failures:
+                segment_url = current_pattern(url, i)
+                self.emit("segment_started", f"Baixando segmento {i}: {segment_url}", index=i, url=segment_url)
+                
+                with timer.phase("download"):
+                    segment = await self._download_indexed(session, segment_url, i, job_dir, timer)
+                
+                if segment is not None:
+                    segment_count += 1
+                    consecutive_failures = 0
+                    yield segment
+                else:
+                    consecutive_failures += 1
+                    self.emit("segment_skipped", f"Falha {consecutive_failures} de {self.max_consecutive_failures}. Tentando mais alguns segmentos...", index=i, failures=consecutive_failures)
+                
+                # Pausa para não sobrecarregar o servidor
+                with timer.phase("sleep_throttle"):
+                    await asyncio.sleep(self.sleep_between_requests)
+                i += 1
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        finally:
+            session.close()
+            
+            # Job cancelado ou sem nenhum segmento: nada nesta pasta será usado
+            if created_job_dir and (cancelled or segment_count == 0):
+                shutil.rmtree(job_dir, ignore_errors=True)
+            
+            self.emit("download_finished", f"Download de segmentos concluído: {segment_count} segmentos baixados", segments=segment_count, timer=timer)
     
-    # Método 6: Último recurso - concatenação binária
-    try:
-        print("Tentando método final: cópia binária direta...")
+    def combine(self, segment_paths, output_path, timer=None):
+        """
+        Combina segmentos TS em um único arquivo MP4
+        
+        Args:
+            segment_paths: Lista de caminhos dos segmentos
+            output_path: Caminho do arquivo MP4 de saída
+            timer: PhaseTimer do job (opcional)
+            
+        Returns:
+            bool: True se a combinação foi bem-sucedida
+        """
+        timer = timer if timer is not None else PhaseTimer()
+        if not segment_paths:
+            self.emit("combine_failed", "Erro: Nenhum segmento para combinar")
+            return False
         
-        # Se for um único arquivo, copiar diretamente
+        # Arquivos auxiliares ficam junto dos segmentos do próprio job
+        job_dir = Path(segment_paths[0]).parent
+        
+        self.emit("combine_started", f"Combinando {len(segment_paths)} segmentos em {output_path}", segments=len(segment_paths), output_path=output_path)
+        
+        # Se for apenas um segmento, tentar remuxar diretamente
         if len(segment_paths) == 1:
-            shutil.copy2(segment_paths[0], output_path)
-            print("Cópia direta concluída.")
+            self.emit("combine_progress", "Detectado segmento único. Tentando remuxar diretamente...")
+            
+            # Método 1: Remuxar usando ffmpeg (preferencial)
+            with timer.phase("combine:ffmpeg_remux"):
+                try:
+                    # Comando ffmpeg para remuxar TS para MP4
+                    cmd = self.ffmpeg_command() + [
+                        "-i", str(segment_paths[0]),
+                        "-c", "copy",  # Copiar streams sem recodificar
+                        "-bsf:a", "aac_adtstoasc",  # Necessário para alguns streams AAC
+                        "-movflags", "+faststart",  # Otimiza para streaming web
+                        str(output_path)
+                    ]
+                    
+                    self.emit("combine_progress", "Executando ffmpeg para remuxar o segmento...", method="ffmpeg_remux")
+                    process = subprocess.run(cmd, capture_output=True, text=True)
+                    
+                    if process.returncode == 0:
+                        self.emit("combine_method_succeeded", "Remuxagem com ffmpeg concluída com sucesso!", method="ffmpeg_remux")
+                        return True
+                    else:
+                        self.emit("combine_method_failed", f"Erro ao remuxar com ffmpeg: {process.stderr}", method="ffmpeg_remux")
+                        # Continua para métodos alternativos
+                except Exception as e:
+                    self.emit("combine_method_failed", f"Erro durante remuxagem com ffmpeg: {str(e)}", method="ffmpeg_remux")
+                    # Continua para métodos alternativos
+            
+            # Método 2: Usar rename/copy direto se for MP4 mascarado como TS
+            with timer.phase("combine:header_copy"):
+                try:
+                    # Verificar conteúdo do arquivo para determinar tipo real
+                    with open(segment_paths[0], 'rb') as f:
+                        header = f.read(12)  # Ler primeiros bytes
+                    
+                    # Verificar se é um MP4 real (começa com ftyp ou moov)
+                    is_mp4 = False
+                    for pattern in [b'ftyp', b'moov']:
+                        if pattern in header:
+                            is_mp4 = True
+                            break
+                    
+                    if is_mp4:
+                        self.emit("combine_progress", "Detectado cabeçalho MP4 no segmento .ts. Copiando diretamente...", method="header_copy")
+                        shutil.copy2(segment_paths[0], output_path)
+                        self.emit("combine_method_succeeded", "Cópia direta concluída.", method="header_copy")
+                        return True
+                except Exception as e:
+                    self.emit("combine_method_failed", f"Erro durante verificação de cabeçalho: {str(e)}", method="header_copy")
+                    # Continua para métodos alternativos
             
-            # Tentar converter com yt-dlp como último recurso
+            # Método 3: Usar mkvmerge se disponível (pode lidar com diversos formatos)
+            with timer.phase("combine:mkvmerge"):
+                try:
+                    cmd = ["mkvmerge", "-o", str(output_path), str(segment_paths[0])]
+                    self.emit("combine_progress", "Tentando remuxar com mkvmerge...", method="mkvmerge")
+                    process = subprocess.run(cmd, capture_output=True, text=True)
+                    
+                    if process.returncode == 0 or process.returncode == 1:  # mkvmerge retorna 1 para avisos
+                        self.emit("combine_method_succeeded", "Remuxagem com mkvmerge concluída!", method="mkvmerge")
+                        return True
+                    else:
+                        self.emit("combine_method_failed", f"Erro ao remuxar com mkvmerge: {process.stderr}", method="mkvmerge")
+                        # Continua para método alternativo
+                except Exception as e:
+                    self.emit("combine_method_failed", f"Erro ou mkvmerge não disponível: {str(e)}", method="mkvmerge")
+                    # Continua para método alternativo
+        
+        # Método para múltiplos segmentos ou se os anteriores falharam
+        # Método 4: Concatenação usando o ffmpeg
+        with timer.phase("combine:ffmpeg_concat"):
             try:
-                print("Tentando converter com yt-dlp...")
-                converted_path = output_path.with_suffix('.converted.mp4')
+                # Criar arquivo de lista de segmentos para o ffmpeg
+                segments_list_path = job_dir / "segments.txt"
+                with open(segments_list_path, 'w') as f:
+                    for segment_path in segment_paths:
+                        f.write(f"file '{segment_path.absolute()}'\n")
                 
-                cmd = [
-                    "yt-dlp",
-                    "--recode-video", "mp4",
-                    "-o", str(converted_path),
+                # Comando ffmpeg para concatenar
+                cmd = self.ffmpeg_command() + [
+                    "-f", "concat",
+                    "-safe", "0",
+                    "-i", str(segments_list_path),
+                    "-c", "copy",
+                    "-bsf:a", "aac_adtstoasc",  # Necessário para alguns streams AAC
+                    "-movflags", "+faststart",  # Otimiza para streaming web
                     str(output_path)
                 ]
                 
+                self.emit("combine_progress", "Executando ffmpeg para combinar os segmentos...", method="ffmpeg_concat")
                 process = subprocess.run(cmd, capture_output=True, text=True)
                 
-                if process.returncode == 0 and converted_path.exists():
-                    # Substituir o arquivo original pelo convertido
-                    shutil.move(str(converted_path), str(output_path))
-                    print("Conversão com yt-dlp concluída com sucesso!")
+                if process.returncode == 0:
+                    self.emit("combine_method_succeeded", "Combinação com ffmpeg concluída com sucesso!", method="ffmpeg_concat")
                     return True
                 else:
-                    print("Conversão com yt-dlp falhou. Mantendo arquivo original.")
-            except Exception as yt_dlp_error:
-                print(f"Erro ao converter com yt-dlp: {str(yt_dlp_error)}")
-                print("Mantendo arquivo original.")
-            
-            return True
+                    self.emit("combine_method_failed", f"Erro ao combinar com ffmpeg: {process.stderr}", method="ffmpeg_concat")
+                    # Continua para método alternativo
+                
+            except Exception as e:
+                self.emit("combine_method_failed", f"Erro durante combinação com ffmpeg: {str(e)}", method="ffmpeg_concat")
+                # Continua para método alternativo
+        
+        # Método 5: Usar ffmpeg com protocolo TS
+        with timer.phase("combine:ts_concat_remux"):
+            try:
+                self.emit("combine_progress", "Tentando método alternativo com ffmpeg (protocolo TS)...", method="ts_concat_remux")
+                # Concatenar todos os arquivos .ts em um único .ts
+                ts_concat_path = job_dir / "concatenated.ts"
+                
+                with open(ts_concat_path, 'wb') as outfile:
+                    for segment_path in segment_paths:
+                        with open(segment_path, 'rb') as infile:
+                            outfile.write(infile.read())
+                
+                # Converter o .ts concatenado para MP4
+                cmd = self.ffmpeg_command() + [
+                    "-i", str(ts_concat_path),
+                    "-c", "copy",
+                    "-bsf:a", "aac_adtstoasc",
+                    "-movflags", "+faststart",
+                    str(output_path)
+                ]
+                
+                process = subprocess.run(cmd, capture_output=True, text=True)
+                
+                # Limpar arquivo temporário
+                if ts_concat_path.exists():
+                    ts_concat_path.unlink()
+                
+                if process.returncode == 0:
+                    self.emit("combine_method_succeeded", "Remuxagem do TS concatenado concluída com sucesso!", method="ts_concat_remux")
+                    return True
+                else:
+                    self.emit("combine_method_failed", f"Erro ao remuxar o TS concatenado: {process.stderr}", method="ts_concat_remux")
+                    # Continua para método alternativo
+            except Exception as e:
+                self.emit("combine_method_failed", f"Erro durante remuxagem do TS concatenado: {str(e)}", method="ts_concat_remux")
+                # Continua para método alternativo
+        
+        # Método 6: Último recurso - concatenação binária
+        with timer.phase("combine:binary_copy"):
+            try:
+                self.emit("combine_progress", "Tentando método final: cópia binária direta...", method="binary_copy")
+                
+                # Se for um único arquivo, copiar diretamente
+                if len(segment_paths) == 1:
+                    shutil.copy2(segment_paths[0], output_path)
+                    self.emit("combine_method_succeeded", "Cópia direta concluída.", method="binary_copy")
+                    
+                    # Tentar converter com yt-dlp como último recurso
+                    try:
+                        self.emit("combine_progress", "Tentando converter com yt-dlp...", method="binary_copy")
+                        converted_path = output_path.with_suffix('.converted.mp4')
+                        
+                        cmd = [
+                            "yt-dlp",
+                            "--recode-video", "mp4",
+                            "-o", str(converted_path),
+                            str(output_path)
+                        ]
+                        
+                        process = subprocess.run(cmd, capture_output=True, text=True)
+                        
+                        if process.returncode == 0 and converted_path.exists():
+                            # Substituir o arquivo original pelo convertido
+                            shutil.move(str(converted_path), str(output_path))
+                            self.emit("combine_method_succeeded", "Conversão com yt-dlp concluída com sucesso!", method="binary_copy")
+                            return True
+                        else:
+                            self.emit("warning", "Conversão com yt-dlp falhou. Mantendo arquivo original.", method="binary_copy")
+                    except Exception as yt_dlp_error:
+                        self.emit("combine_method_failed", f"Erro ao converter com yt-dlp: {str(yt_dlp_error)}", method="binary_copy")
+                        self.emit("warning", "Mantendo arquivo original.", method="binary_copy")
+                    
+                    return True
+                else:
+                    # Concatenar todos os arquivos
+                    with open(output_path, 'wb') as outfile:
+                        for segment_path in segment_paths:
+                            with open(segment_path, 'rb') as infile:
+                                outfile.write(infile.read())
+                    
+                    self.emit("combine_method_succeeded", "Concatenação direta concluída.", method="binary_copy")
+                    
+                    # Aviso sobre possíveis problemas
+                    self.emit("warning", "AVISO: A concatenação direta pode resultar em vídeos corrompidos.", method="binary_copy")
+                    self.emit("warning", "Se o vídeo não abrir, tente instalar ffmpeg e executar novamente.", method="binary_copy")
+                    self.emit("warning", "Ou use um conversor online para converter o arquivo TS para MP4.", method="binary_copy")
+                    
+                    return True
+            except Exception as inner_e:
+                self.emit("combine_method_failed", f"Erro no método alternativo: {str(inner_e)}", method="binary_copy")
+                return False
+    
+    async def combine_async(self, segment_paths, output_path, timer=None):
+        """Executa `combine` sem bloquear o event loop"""
+        return await self._run_blocking(self.combine, segment_paths, output_path, timer)
+    
+    def cleanup(self, segment_paths, timer=None):
+        """Limpa os segmentos e a pasta temporária do job"""
+        timer = timer if timer is not None else PhaseTimer()
+        with timer.phase("cleanup"):
+            try:
+                job_dirs = set()
+                for path in segment_paths:
+                    path = Path(path)
+                    job_dirs.add(path.parent)
+                    if path.exists():
+                        path.unlink()
+                
+                for job_dir in job_dirs:
+                    for leftover in ("segments.txt", "concatenated.ts"):
+                        leftover_path = job_dir / leftover
+                        if leftover_path.exists():
+                            leftover_path.unlink()
+                    
+                    # Remove só pastas de job vazias, nunca o próprio temp_dir
+                    if job_dir.resolve() != self.temp_dir.resolve() and not any(job_dir.iterdir()):
+                        job_dir.rmdir()
+                
+                self.emit("cleanup_done", "Limpeza de arquivos temporários concluída.")
+            except Exception as e:
+                self.emit("warning", f"Aviso: Erro durante limpeza de arquivos temporários: {str(e)}", error=str(e))
+    
+    async def download(self, url, output_name=None, start_segment=0, max_segments=1000,
+                       keep_segments=False, job_dir=None, timer=None):
+        """
+        Executa um job completo: baixa, combina e limpa os segmentos
+        
+        Args:
+            url: URL do segmento base
+            output_name: Nome do arquivo de saída (padrão: derivado da URL)
+            start_segment: Número do segmento inicial
+            max_segments: Número máximo de segmentos a tentar
+            keep_segments: Não apagar os segmentos temporários
+            job_dir: Pasta dos segmentos (padrão: uma nova pasta em temp_dir)
+            timer: PhaseTimer do job (padrão: um novo, enviado no evento job_summary)
+        
+        Returns:
+            Path: Caminho do vídeo gerado, ou None em caso de falha
+        """
+        timer = timer if timer is not None else PhaseTimer()
+        try:
+            return await self._run_download(url, output_name, start_segment, max_segments,
+                                            keep_segments, job_dir, timer)
+        finally:
+            self.emit("job_summary", timer.summary(), timer=timer)
+    
+    async def _run_download(self, url, output_name, start_segment, max_segments,
+                            keep_segments, job_dir, timer):
+        """Corpo de `download`, separado para que o resumo seja emitido em qualquer saída"""
+        _, output_dir = self.ensure_dirs(timer)
+        output_path = output_dir / build_output_name(url, output_name)
+        
+        async with aclosing(self.stream(url, start_segment, max_segments, job_dir, timer)) as segments:
+            segment_paths = [segment.path async for segment in segments]
+        
+        if not segment_paths:
+            self.emit("job_failed", "Erro: Nenhum segmento foi baixado. Verifique a URL e tente novamente.", url=url)
+            return None
+        
+        try:
+            combined = await self.combine_async(segment_paths, output_path, timer)
+        except asyncio.CancelledError:
+            # combine já terminou (ver _run_blocking); descartar os segmentos do job
+            self.cleanup(segment_paths, timer)
+            raise
+        
+        if not combined:
+            self.emit("job_failed", "Erro ao combinar segmentos. Os segmentos individuais foram mantidos.", url=url, job_dir=segment_paths[0].parent)
+            return None
+        
+        filesize_mb = output_path.stat().st_size / (1024 * 1024)
+        self.emit("job_completed", f"Vídeo salvo com sucesso em: {output_path}", output_path=output_path, size=output_path.stat().st_size)
+        self.emit("job_progress", f"Tamanho do arquivo: {filesize_mb:.2f} MB", output_path=output_path)
+        
+        if keep_segments:
+            self.emit("segments_kept", f"Segmentos temporários mantidos. Diretório de segmentos: {segment_paths[0].parent}", job_dir=segment_paths[0].parent)
         else:
-            # Concatenar todos os arquivos
-            with open(output_path, 'wb') as outfile:
-                for segment_path in segment_paths:
-                    with open(segment_path, 'rb') as infile:
-                        outfile.write(infile.read())
-            
-            print("Concatenação direta concluída.")
-            
-            # Aviso sobre possíveis problemas
-            print("\nAVISO: A concatenação direta pode resultar em vídeos corrompidos.")
-            print("Se o vídeo não abrir, tente instalar ffmpeg e executar novamente.")
-            print("Ou use um conversor online para converter o arquivo TS para MP4.")
-            
-            return True
-    except Exception as inner_e:
-        print(f"Erro no método alternativo: {str(inner_e)}")
-        return False
+            await self._run_blocking(self.cleanup, segment_paths, timer)
+        
+        return output_path
 
-def cleanup(segment_paths):
-    """Limpa arquivos temporários"""
-    try:
-        for path in segment_paths:
-            if path.exists():
-                path.unlink()
+def write_profile_report(report_path, timer, cprofiler=None, memory_snapshot=None, memory_peak=None):
+    """
+    Grava o relatório de profiling do job
+    
+    Args:
+        report_path: Caminho do arquivo de relatório
+        timer: PhaseTimer com as medições do job
+        cprofiler: Instância de cProfile.Profile já parada (opcional)
+        memory_snapshot: Snapshot do tracemalloc (opcional)
+        memory_peak: Pico de memória rastreada em bytes (opcional)
+    """
+    sections = ["=== Tempo por fase ===", timer.summary()]
+    
+    if cprofiler is not None:
+        # Estatísticas brutas para abrir no snakeviz/pstats
+        stats_path = report_path.with_suffix(".prof")
+        cprofiler.dump_stats(str(stats_path))
         
-        segments_list = TEMP_DIR / "segments.txt"
-        if segments_list.exists():
-            segments_list.unlink()
-            
-        print("\nLimpeza de arquivos temporários concluída.")
-    except Exception as e:
-        print(f"Aviso: Erro durante limpeza de arquivos temporários: {str(e)}")
+        stream = StringIO()
+        stats = pstats.Stats(cprofiler, stream=stream)
+        stats.sort_stats("cumulative").print_stats(40)
+        sections += ["", "=== cProfile (top 40 por tempo cumulativo) ===", f"Estatísticas completas: {stats_path}", stream.getvalue()]
+    
+    if memory_snapshot is not None:
+        sections += ["", "=== tracemalloc (top 25 alocações por linha) ==="]
+        if memory_peak is not None:
+            sections.append(f"Pico de memória rastreada: {memory_peak / (1024 * 1024):.2f} MB")
+        for stat in memory_snapshot.statistics("lineno")[:25]:
+            sections.append(str(stat))
+    
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(report_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(sections) + "\n")
+    
+    print(f"Relatório de profiling salvo em: {report_path}")
+
+def print_event(event):
+    """Exibe um DownloadEvent no terminal, no formato da linha de comando"""
+    # O resumo por fase é impresso pelo main, mesmo se o job falhar no meio
+    if event.kind == "job_summary":
+        return
+    # Eventos que abrem uma nova etapa ganham uma linha em branco antes
+    if event.kind in ("download_started", "full_video_detected", "download_finished", "combine_started",
+                      "job_failed", "job_completed", "segments_kept", "cleanup_done"):
+        print()
+    print(event.message)
 
 def main():
     """Função principal"""
@@ -451,106 +928,71 @@ def main():
     parser.add_argument("-m", "--max", type=int, default=500, help="Número máximo de segmentos (padrão: 500)")
     parser.add_argument("--skip-cleanup", action="store_true", help="Não apagar arquivos temporários")
     parser.add_argument("--ffmpeg-path", help="Caminho para o executável do ffmpeg")
+    parser.add_argument("--profile", action="append", choices=["cprofile", "tracemalloc"],
+                        help="Ativa profiling do job (pode ser repetido) e grava um relatório")
+    parser.add_argument("--profile-output", help=f"Arquivo do relatório de profiling (padrão: {OUTPUT_DIR / PROFILE_REPORT_NAME})")
     args = parser.parse_args()
     
-    print("\n=============================================")
-    print(" TS DOWNLOADER - BAIXADOR DE VÍDEOS .TS")
-    print("=============================================\n")
+    # Um único job por execução: rodar tudo na thread principal mantém o cProfile completo
+    downloader = Downloader(on_event=print_event, use_threads=False)
+    timer = PhaseTimer()
+    profile_modes = set(args.profile or [])
+    cprofiler = cProfile.Profile() if "cprofile" in profile_modes else None
     
-    # Verificar se ffmpeg está instalado
-    global FFMPEG_PATH
-    FFMPEG_PATH = None
+    if "tracemalloc" in profile_modes:
+        tracemalloc.start()
+    if cprofiler is not None:
+        cprofiler.enable()
     
-    # Primeiro, tentar o caminho fornecido pelo usuário
-    if args.ffmpeg_path:
-        try:
-            subprocess.run([args.ffmpeg_path, "-version"], capture_output=True, text=True)
-            FFMPEG_PATH = args.ffmpeg_path
-            print(f"Usando ffmpeg em: {FFMPEG_PATH}")
-        except:
-            print(f"AVISO: ffmpeg não encontrado em {args.ffmpeg_path}")
-    
-    # Tentar executável no diretório atual
-    if not FFMPEG_PATH:
-        try:
-            local_ffmpeg = Path("./ffmpeg").absolute()
-            if local_ffmpeg.exists():
-                subprocess.run([str(local_ffmpeg), "-version"], capture_output=True, text=True)
-                FFMPEG_PATH = str(local_ffmpeg)
-                print(f"Usando ffmpeg local em: {FFMPEG_PATH}")
-        except:
-            pass
-    
-    # Por fim, tentar no PATH do sistema
-    if not FFMPEG_PATH:
-        try:
-            subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True)
-            FFMPEG_PATH = "ffmpeg"
-            print("Usando ffmpeg do sistema.")
-        except:
-            print("AVISO: ffmpeg não encontrado. A combinação de segmentos pode ser menos eficiente.")
-    
-    # Garantir diretórios
-    _, output_dir = ensure_dirs()
-    
-    # Construir nome do arquivo de saída
-    if args.output:
-        output_name = args.output
-    else:
-        # Extrai nome do vídeo da URL
-        url_parts = urlparse(args.url)
-        path_parts = url_parts.path.split('/')
+    try:
+        run_job(args, downloader, timer)
+    finally:
+        if cprofiler is not None:
+            cprofiler.disable()
         
-        # Tenta obter um nome significativo
-        if len(path_parts) >= 2:
-            # Pega o penúltimo segmento da URL, que geralmente tem o nome do vídeo
-            video_name = path_parts[-2]
-        else:
-            video_name = "video"
+        memory_snapshot = None
+        memory_peak = None
+        if "tracemalloc" in profile_modes:
+            memory_snapshot = tracemalloc.take_snapshot()
+            memory_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
         
-        output_name = f"{video_name}.mp4"
-    
-    # Caminho completo de saída
-    if not output_name.lower().endswith('.mp4'):
-        output_name += '.mp4'
-    output_path = output_dir / output_name
+        print("\n=============================================")
+        print(" RESUMO DE TEMPO POR FASE")
+        print("=============================================\n")
+        print(timer.summary())
+        
+        if profile_modes:
+            report_path = Path(args.profile_output) if args.profile_output else downloader.output_dir / PROFILE_REPORT_NAME
+            write_profile_report(report_path, timer, cprofiler, memory_snapshot, memory_peak)
+
+def run_job(args, downloader, timer):
+    """
+    Executa o job de download a partir dos argumentos da linha de comando
     
-    # Baixar segmentos
-    segment_paths = download_all_segments(
-        args.url, 
-        output_name, 
-        start_segment=args.start,
-        max_segments=args.max
-    )
+    Args:
+        args: Namespace retornado pelo argparse
+        downloader: Downloader configurado para o job
+        timer: PhaseTimer que recebe as medições do job
+    """
+    print("\n=============================================")
+    print(" TS DOWNLOADER - BAIXADOR DE VÍDEOS .TS")
+    print("=============================================\n")
     
-    if not segment_paths:
-        print("Erro: Nenhum segmento foi baixado. Verifique a URL e tente novamente.")
-        return
+    # Verificar se ffmpeg está instalado
+    downloader.locate_ffmpeg(args.ffmpeg_path, timer)
     
-    # Combinar segmentos
-    if combine_segments(segment_paths, output_path):
-        print(f"\nVídeo salvo com sucesso em: {output_path}")
-        
-        # Tamanho do arquivo
-        filesize_mb = output_path.stat().st_size / (1024 * 1024)
-        print(f"Tamanho do arquivo: {filesize_mb:.2f} MB")
-    else:
-        print("\nErro ao combinar segmentos. Os segmentos individuais foram mantidos.")
+    output_path = asyncio.run(downloader.download(
+        args.url,
+        args.output,
+        start_segment=args.start,
+        max_segments=args.max,
+        keep_segments=args.skip_cleanup,
+        timer=timer
+    ))
     
-    # Limpar arquivos temporários
-    if not args.skip_cleanup:
-        cleanup(segment_paths)
+    if output_path is not None and not args.skip_cleanup:
         print("\nProcesso concluído!")
-    else:
-        print("\nSegmentos temporários mantidos a pedido do usuário.")
-        print(f"Diretório de segmentos: {TEMP_DIR}")
-
-# Definir uma variável global para o caminho do ffmpeg
-FFMPEG_PATH = None
-
-def get_ffmpeg_command():
-    """Retorna o comando ffmpeg, usando o caminho definido globalmente se disponível"""
-    return [FFMPEG_PATH] if FFMPEG_PATH else ["ffmpeg"]
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()